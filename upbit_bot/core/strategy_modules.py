@@ -24,8 +24,9 @@ class MarketFilter:
             
             # 현재가 vs 1시간 전 종가 (row index -1 is current partial candle, -2 is previous completed candle)
             # But get_ohlcv returns completed candles? No, pyupbit returns current progressing candle as last.
-            curr = df['close'].iloc[-1]
-            prev = df['close'].iloc[-2]
+            closes = df['close'].to_numpy(copy=False)
+            curr = float(closes[-1])
+            prev = float(closes[-2])
             change = (curr - prev) / prev
             
             if change <= -0.005: # -0.5% 이하로 하락시
@@ -214,7 +215,7 @@ class RiskEngine:
 
     def check_exit(self, current_price, position_data: Dict[str, Any]):
         """
-        position_data: { 'entry_price': float, 'sl': float, 'tp': float, 'entry_time': datetime }
+        position_data: { 'entry_price': float, 'sl': float, 'tp': float, 'entry_time_ts': float }
         return: (Boolean 탈출여부, 사유)
         """
         # 1. Stop Loss
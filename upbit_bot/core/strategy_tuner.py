@@ -22,6 +22,9 @@ class StrategyTuner:
         self.last_tune_ts = 0
         self.mode = "Neutral"
         self.last_mode_change_ts = 0
+        # tune() 반환용 복사본 캐시 (설정이 바뀔 때만 새로 deepcopy)
+        self._base_snapshot = None
+        self._cfg_snapshot = None
 
     def get_market_regime(self, df):
         """시장 데이터 기반 장세 판단 (데이터 부족 방어 포함)"""
@@ -52,10 +55,10 @@ class StrategyTuner:
             
             # 0 나누기 방지
             bb_width = (bb_upper - bb_lower) / bb_middle.replace(0, np.nan)
-            avg_width = bb_width.rolling(20).mean().iloc[-1]
-            curr_width = bb_width.iloc[-1]
+            avg_width = bb_width.rolling(20).mean().iat[-1]
+            curr_width = bb_width.iat[-1]
             
-            adx = df['adx'].iloc[-1]
+            adx = df['adx'].iat[-1]
             
             if pd.isna(avg_width) or pd.isna(curr_width) or pd.isna(adx):
                 return "Neutral", 0, 0
@@ -73,18 +76,27 @@ class StrategyTuner:
             LOGGER.error(f"Regime Check Error: {e}")
             return "Neutral", 0, 0
 
+    def _snapshot(self):
+        """current_cfg 복사본 (모드가 바뀌기 전까지 같은 객체 재사용)"""
+        if self._cfg_snapshot is None:
+            self._cfg_snapshot = copy.deepcopy(self.current_cfg)
+        return self._cfg_snapshot
+
     def tune(self, df, perf_stats):
         """
-        주기적으로 호출되어 설정을 최적화
+        주기적으로 호출되어 설정을 최적화.
+        반환값은 캐시된 복사본이므로 호출측에서 수정하지 말 것 (설정이 같으면 같은 객체).
         """
         # 0. 튜너 꺼져있으면 기본값 복사본 리턴 (오염 방지)
         if not self.enabled:
-            return copy.deepcopy(self.base_cfg)
+            if self._base_snapshot is None:
+                self._base_snapshot = copy.deepcopy(self.base_cfg)
+            return self._base_snapshot
 
         now = time.time()
         # 튜닝 주기 체크
         if now - self.last_tune_ts < self.tune_interval:
-            return copy.deepcopy(self.current_cfg) # 현재 설정 복사본
+            return self._snapshot() # 현재 설정 복사본
         
         self.last_tune_ts = now
         
@@ -99,7 +111,7 @@ class StrategyTuner:
             if tpd_24h == 0:
                 LOGGER.info("🔓 [Auto-Reset] 거래 부재로 Strict 해제")
                 self._change_mode("Neutral", "Time-Reset", adx, bb_w, cons_loss, win_rate, tpd_24h)
-                return copy.deepcopy(self.current_cfg)
+                return self._snapshot()
 
         # 3. 목표 모드 결정
         target_mode = "Neutral"
@@ -118,7 +130,7 @@ class StrategyTuner:
         if target_mode != self.mode and (now - self.last_mode_change_ts > 3600):
             self._change_mode(target_mode, regime, adx, bb_w, cons_loss, win_rate, tpd_24h)
             
-        return copy.deepcopy(self.current_cfg)
+        return self._snapshot()
 
     def _change_mode(self, mode, reason, adx, bb_w, loss, win_rate, tpd):
         """실제 설정을 변경하고 상세 로그 기록"""
@@ -162,3 +174,4 @@ class StrategyTuner:
             LOGGER.info("   └ Action: 진입점수하향(5.0), 거래량가중치↑")
 
         self.current_cfg = new_cfg
+        self._cfg_snapshot = None
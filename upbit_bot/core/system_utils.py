@@ -4,6 +4,7 @@ import time
 import json
 import signal
 import logging
+import threading
 import pytz
 from logging.handlers import RotatingFileHandler
 
@@ -37,13 +38,15 @@ class RequestLimiter:
     def __init__(self, min_interval=0.15): # 초당 8회 이하 권장
         self.min_interval = min_interval
         self.last_ts = 0
+        self._lock = threading.Lock() # 여러 스레드에서 동시 조회 시에도 간격 보장
 
     def wait(self):
-        now = time.time()
-        diff = now - self.last_ts
-        if diff < self.min_interval:
-            time.sleep(self.min_interval - diff)
-        self.last_ts = time.time()
+        with self._lock:
+            now = time.time()
+            diff = now - self.last_ts
+            if diff < self.min_interval:
+                time.sleep(self.min_interval - diff)
+            self.last_ts = time.time()
 
 LIMITER = RequestLimiter()
 
@@ -1,17 +1,63 @@
 import time
 import pyupbit
 import logging
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
 from core.system_utils import LIMITER, LOGGER
 
+QUOTATION_URL = "https://api.upbit.com/v1"
+CANDLE_COLUMNS = {
+    'opening_price': 'open',
+    'high_price': 'high',
+    'low_price': 'low',
+    'trade_price': 'close',
+    'candle_acc_trade_volume': 'volume',
+    'candle_acc_trade_price': 'value',
+}
+
+def _candle_path(interval):
+    """pyupbit interval 문자열 -> 캔들 API 경로 (지원 안 하면 None)"""
+    if interval.startswith("minute"):
+        unit = interval[len("minute"):].lstrip("s")
+        return f"candles/minutes/{unit}" if unit.isdigit() else None
+    return {"day": "candles/days", "week": "candles/weeks", "month": "candles/months"}.get(interval)
+
+def _candles_to_df(candles):
+    """캔들 API 응답(최신순) -> pyupbit.get_ohlcv 와 같은 형태의 DataFrame (과거순)"""
+    if not candles:
+        return None
+    candles = candles[::-1]
+    index = pd.to_datetime([c['candle_date_time_kst'] for c in candles])
+    df = pd.DataFrame.from_records(candles, columns=list(CANDLE_COLUMNS), index=index)
+    return df.rename(columns=CANDLE_COLUMNS).astype('float64')
+
 class UpbitAPIWrapper:
     def __init__(self, access_key, secret_key):
         self.upbit = pyupbit.Upbit(access_key, secret_key)
         self.min_order_krw = 5000
 
+        # 시세 조회용 keep-alive 세션 (호출마다 TCP/TLS 핸드셰이크 방지)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+        self._session.mount("https://", adapter)
+        self._session.headers.update({"accept": "application/json"})
+
     def get_ohlcv(self, ticker, interval, count=200):
         LIMITER.wait()
         try:
-            return pyupbit.get_ohlcv(ticker, interval=interval, count=count)
+            path = _candle_path(interval)
+            if path is None or count > 200:
+                # 페이지네이션이 필요한 경우 등은 pyupbit에 위임
+                return pyupbit.get_ohlcv(ticker, interval=interval, count=count)
+
+            resp = self._session.get(
+                f"{QUOTATION_URL}/{path}",
+                params={"market": ticker, "count": count},
+                timeout=(3.05, 10)
+            )
+            resp.raise_for_status()
+            return _candles_to_df(resp.json())
         except Exception as e:
             LOGGER.error(f"Data Fetch Error ({ticker}): {e}")
             return None
@@ -51,17 +97,45 @@ class UpbitAPIWrapper:
              LOGGER.error(f"Get Current Price Error ({ticker}): {e}")
              return None
 
-    def compute_total_equity(self):
-        """계좌 총 평가금액 계산 (단일화된 로직)"""
+    def get_ticker_quotes(self, tickers):
+        """
+        여러 티커 현재가를 /v1/ticker 한 번으로 조회
+        -> {ticker: (trade_price, acc_trade_volume)} (실패 시 빈 dict)
+        acc_trade_volume은 UTC 0시 기준 당일 누적 거래량
+        """
+        LIMITER.wait()
+        try:
+            resp = self._session.get(
+                f"{QUOTATION_URL}/ticker",
+                params={"markets": ",".join(tickers)},
+                timeout=(3.05, 10)
+            )
+            resp.raise_for_status()
+            return {
+                t['market']: (float(t['trade_price']), float(t['acc_trade_volume']))
+                for t in resp.json()
+            }
+        except Exception as e:
+            LOGGER.error(f"Get Ticker Prices Error: {e}")
+            return {}
+
+    def compute_total_equity(self, balances=None):
+        """계좌 총 평가금액 계산 (단일화된 로직). balances를 넘기면 잔고 재조회 생략"""
         try:
-            # KRW Balance
-            krw_bal = self.get_balance("KRW")
+            if balances is None:
+                # KRW Balance
+                krw_bal = self.get_balance("KRW")
+                # Balances
+                balances = self.get_balances()
+            else:
+                krw_bal = next(
+                    (float(b.get('balance', 0)) for b in balances
+                     if isinstance(b, dict) and b.get('currency') == 'KRW'),
+                    0.0
+                )
             if not isinstance(krw_bal, (int, float)):
                 krw_bal = 0
             
-            # Balances
-            balances = self.get_balances()
-            
             # API 응답 유효성 검사
             if not isinstance(balances, list):
                 LOGGER.warning(f"Balances API 응답 이상: {type(balances)}")
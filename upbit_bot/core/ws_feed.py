@@ -0,0 +1,156 @@
+import json
+import uuid
+import asyncio
+import threading
+from collections import deque
+
+import pandas as pd
+
+from core.system_utils import LOGGER
+
+WS_URL = "wss://api.upbit.com/websocket/v1"
+KST_OFFSET_MS = 9 * 3600 * 1000
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'value']
+
+
+def interval_seconds(interval):
+    """pyupbit 분봉 interval 문자열 -> 봉 길이(초). 분봉이 아니면 None"""
+    if not interval.startswith("minute"):
+        return None
+    unit = interval[len("minute"):].lstrip("s")
+    return int(unit) * 60 if unit.isdigit() else None
+
+
+def bar_start_kst(now_ts, bar_secs):
+    """now_ts(epoch 초)가 속한 봉의 시작 시각 (pyupbit get_ohlcv 인덱스와 같은 KST naive Timestamp)"""
+    return pd.Timestamp((now_ts // bar_secs) * bar_secs * 1000 + KST_OFFSET_MS, unit='ms')
+
+
+def is_current_bar(df, now_ts, bar_secs):
+    """
+    df의 마지막 행이 지금 진행 중인 봉인지.
+    Upbit는 체결 없는 봉을 건너뛰므로 봉이 막 바뀐 직후엔 마지막 행이 이미 마감된 이전 봉일 수 있음
+    """
+    return len(df) > 0 and df.index[-1] == bar_start_kst(now_ts, bar_secs)
+
+
+class UpbitWsFeed:
+    """
+    Upbit 공개 WebSocket 체결(trade) 스트림으로 티커별 OHLCV 봉을 메모리에서 갱신.
+    - 연결 시마다 REST(get_ohlcv)로 lookback 개 봉을 시드
+    - 체결마다 현재 봉의 H/L/C/V 갱신, 봉 경계를 넘으면 새 봉 추가 (deque maxlen)
+    - 연결이 끊겨 있거나 시드가 없으면 get_df()는 None → 호출측에서 REST로 대체
+    """
+    def __init__(self, wrapper, markets, interval, lookback=60):
+        self.wrapper = wrapper
+        self.markets = list(markets)
+        self.interval = interval
+        self.lookback = lookback
+        bar_secs = interval_seconds(interval)
+        self.bar_ms = bar_secs * 1000 if bar_secs else None
+
+        # bar: [start_ms(KST), open, high, low, close, volume, value]
+        self._bars = {t: deque(maxlen=lookback) for t in self.markets}
+        self._df_cache = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.connected = False
+
+    def start(self):
+        if self.bar_ms is None:
+            LOGGER.warning(f"WS Feed: 분봉이 아닌 interval({self.interval})은 미지원 → REST 사용")
+            return False
+        self._thread = threading.Thread(
+            target=asyncio.run, args=(self._run(),), name="UpbitWsFeed", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def get_df(self, ticker):
+        """pyupbit.get_ohlcv 와 같은 형태의 DataFrame (체결이 들어오기 전까지 캐시 재사용)"""
+        with self._lock:
+            if not self.connected:
+                return None
+            df = self._df_cache.get(ticker)
+            if df is not None:
+                return df
+            bars = self._bars.get(ticker)
+            if not bars:
+                return None
+            rows = [bar[:] for bar in bars]
+
+        starts = [row.pop(0) for row in rows]
+        df = pd.DataFrame(rows, columns=BAR_COLUMNS, index=pd.to_datetime(starts, unit='ms'), dtype='float64')
+        with self._lock:
+            self._df_cache[ticker] = df
+        return df
+
+    def _seed(self):
+        for ticker in self.markets:
+            df = self.wrapper.get_ohlcv(ticker, interval=self.interval, count=self.lookback)
+            if df is None:
+                continue
+            bars = deque(maxlen=self.lookback)
+            for ts, row in zip(df.index, df[BAR_COLUMNS].itertuples(index=False)):
+                bars.append([ts.value // 1_000_000, *map(float, row)])
+            with self._lock:
+                self._bars[ticker] = bars
+                self._df_cache.pop(ticker, None)
+
+    def _on_trade(self, code, price, volume, ts_ms):
+        bar_start = ((ts_ms + KST_OFFSET_MS) // self.bar_ms) * self.bar_ms
+        with self._lock:
+            bars = self._bars.get(code)
+            if bars is None:
+                return
+            if bars and bars[-1][0] == bar_start:
+                bar = bars[-1]
+                if price > bar[2]: bar[2] = price
+                if price < bar[3]: bar[3] = price
+                bar[4] = price
+                bar[5] += volume
+                bar[6] += price * volume
+            elif not bars or bar_start > bars[-1][0]:
+                # 봉 마감 → 새 봉 (시가 = 첫 체결가)
+                bars.append([bar_start, price, price, price, price, volume, price * volume])
+            else:
+                return # 이미 지난 봉의 늦은 체결은 무시
+            self._df_cache.pop(code, None)
+
+    async def _run(self):
+        try:
+            import websockets
+        except ImportError:
+            LOGGER.warning("WS Feed: websockets 미설치 → REST 사용")
+            return
+
+        backoff = 1
+        while True:
+            try:
+                async with websockets.connect(WS_URL, ping_interval=60) as ws:
+                    # 끊겨 있던 동안의 체결은 REST 시드로 메움
+                    await asyncio.to_thread(self._seed)
+                    await ws.send(json.dumps([
+                        {"ticket": f"bot-{uuid.uuid4()}"},
+                        {"type": "trade", "codes": self.markets},
+                    ]))
+                    self.connected = True
+                    backoff = 1
+                    LOGGER.info(f"📡 WS Feed Connected ({len(self.markets)} markets)")
+
+                    async for msg in ws:
+                        data = json.loads(msg)
+                        if data.get('type') != 'trade':
+                            continue
+                        self._on_trade(
+                            data['code'],
+                            float(data['trade_price']),
+                            float(data['trade_volume']),
+                            int(data['trade_timestamp'])
+                        )
+            except Exception as e:
+                LOGGER.warning(f"WS Feed Error: {e}")
+
+            self.connected = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
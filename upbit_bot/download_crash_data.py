@@ -4,102 +4,166 @@ Target periods:
 - 2018-11 (worst crash ~-37%)
 - 2020-03 (COVID crash ~-25%)
 - 2022-06 (LUNA/3AC crash ~-38%)
+
+Output: year/month 파티션 Parquet 데이터셋
+  upbit_bot/data/candles/btc-5m/year=YYYY/month=M/part-0.parquet
 """
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
 import pyupbit
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import threading
 import time
 import os
 
-def download_upbit_data(ticker="KRW-BTC", interval="minute5", start_date=None, end_date=None, filename=None):
+logger = logging.getLogger(__name__)
+
+# 페이지 진행 로그는 N페이지마다 한 번만 출력
+PAGE_LOG_EVERY = 10
+
+# 여러 구간을 동시에 받으므로 요청 간격은 스레드 공용으로 관리 (Upbit 시세 API 10 req/s)
+REQUEST_INTERVAL = 0.125
+_rate_lock = threading.Lock()
+_last_request_ts = 0.0
+
+def _throttle():
+    global _last_request_ts
+    with _rate_lock:
+        wait = REQUEST_INTERVAL - (time.monotonic() - _last_request_ts)
+        if wait > 0:
+            time.sleep(wait)
+        _last_request_ts = time.monotonic()
+
+def write_partitioned_dataset(df, base_dir):
+    """
+    date 컬럼 기준 year=YYYY/month=M (hive) 파티션으로 Parquet 저장.
+    읽는 쪽은 filters=[('year','=',2020),('month','=',3)] 로 해당 파티션만 스캔.
+    """
+    dates = df['date'].dt
+    table = pa.Table.from_pandas(df.assign(year=dates.year, month=dates.month), preserve_index=False)
+    ds.write_dataset(
+        table,
+        base_dir,
+        format="parquet",
+        partitioning=["year", "month"],
+        partitioning_flavor="hive",
+        basename_template="part-{i}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+def download_upbit_data(ticker="KRW-BTC", interval="minute5", start_date=None, end_date=None, filename=None, dataset_dir=None):
     """
     Download historical OHLCV data from Upbit.
     Note: Upbit API has limits on how far back data is available.
     """
-    print(f"Downloading {ticker} data from {start_date} to {end_date}...")
+    logger.info("Downloading %s data from %s to %s...", ticker, start_date, end_date)
     
-    all_data = []
+    # 페이지별 DataFrame 대신 (timestamp[ns], values) ndarray만 누적
+    all_ts = []
+    all_values = []
+    columns = None
     current_to = end_date
+    start_ts = pd.Timestamp(start_date)
+    end_ts = pd.Timestamp(end_date)
+    page = 0
     
     while True:
         try:
+            _throttle()
             df = pyupbit.get_ohlcv(ticker, interval=interval, to=current_to, count=200)
             if df is None or len(df) == 0:
-                print(f"No more data available before {current_to}")
+                logger.info("No more data available before %s", current_to)
                 break
             
-            all_data.append(df)
+            if columns is None:
+                columns = list(df.columns)
+            all_ts.append(df.index.to_numpy(dtype='datetime64[ns]').view(np.int64))
+            all_values.append(df[columns].to_numpy(dtype=np.float64))
             oldest_date = df.index[0]
             
-            print(f"Fetched {len(df)} candles, oldest: {oldest_date}")
+            page += 1
+            if page % PAGE_LOG_EVERY == 0:
+                logger.info("[%s] page %d fetched, oldest: %s", start_date, page, oldest_date)
             
-            if oldest_date <= pd.Timestamp(start_date):
+            if oldest_date <= start_ts:
                 break
             
             current_to = oldest_date - timedelta(minutes=1)
-            time.sleep(0.2)  # Rate limit
             
         except Exception as e:
-            print(f"Error: {e}")
+            logger.error("Error: %s", e)
             break
     
-    if not all_data:
-        print("No data fetched!")
+    if not all_ts:
+        logger.warning("No data fetched!")
         return None
     
-    # Combine and sort
-    combined = pd.concat(all_data)
-    combined = combined[~combined.index.duplicated(keep='first')]
-    combined = combined.sort_index()
+    # Combine: np.unique 한 번으로 중복 제거(첫 등장 유지) + 시간순 정렬
+    ts = np.concatenate(all_ts)
+    values = np.concatenate(all_values)
+    ts, first_idx = np.unique(ts, return_index=True)
+    values = values[first_idx]
     
-    # Filter to target range
-    combined = combined[combined.index >= pd.Timestamp(start_date)]
-    combined = combined[combined.index <= pd.Timestamp(end_date)]
+    # Filter to target range (단일 마스크)
+    mask = (ts >= start_ts.value) & (ts <= end_ts.value)
+    combined = pd.DataFrame(values[mask], index=pd.DatetimeIndex(ts[mask].view('datetime64[ns]')), columns=columns)
     
     # Save
-    if filename:
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
+    if filename or dataset_dir:
         combined.reset_index(inplace=True)
         # pyupbit returns: index(datetime), open, high, low, close, volume, value
         # Rename index column to 'date' and drop 'value' if present
         combined.rename(columns={'index': 'date'}, inplace=True)
         if 'value' in combined.columns:
             combined = combined.drop(columns=['value'])
+    if filename:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
         combined.to_csv(filename, index=False)
-        print(f"Saved {len(combined)} candles to {filename}")
+        logger.info("Saved %d candles to %s", len(combined), filename)
+    if dataset_dir and len(combined) > 0:
+        write_partitioned_dataset(combined, dataset_dir)
+        logger.info("Saved %d candles to %s", len(combined), dataset_dir)
     
     return combined
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", handlers=[logging.StreamHandler()])
     output_dir = "upbit_bot/data/candles"
+    dataset_dir = os.path.join(output_dir, "btc-5m")
     
     # Try to download crash periods
     crash_periods = [
         # Most recent first (more likely to be available)
-        ("2022-06-01", "2022-06-30", "btc-5m-202206-luna-crash.csv"),
-        ("2020-03-01", "2020-03-31", "btc-5m-202003-covid-crash.csv"),
-        ("2018-11-01", "2018-11-30", "btc-5m-201811-crash.csv"),
+        ("2022-06-01", "2022-06-30", "202206-luna-crash"),
+        ("2020-03-01", "2020-03-31", "202003-covid-crash"),
+        ("2018-11-01", "2018-11-30", "201811-crash"),
     ]
     
-    for start, end, fname in crash_periods:
-        filepath = os.path.join(output_dir, fname)
-        print(f"\n{'='*50}")
-        print(f"Attempting: {fname}")
-        print(f"{'='*50}")
-        
-        result = download_upbit_data(
-            ticker="KRW-BTC",
-            interval="minute5",
-            start_date=start,
-            end_date=end,
-            filename=filepath
-        )
-        
-        if result is not None and len(result) > 0:
-            print(f"✅ Success: {len(result)} candles")
-        else:
-            print(f"❌ Failed or no data available for {start} to {end}")
+    # 구간끼리는 독립적인 I/O 작업 → 동시 다운로드 (요청 간격은 _throttle이 보장)
+    with ThreadPoolExecutor(max_workers=len(crash_periods)) as executor:
+        futures = {}
+        for start, end, fname in crash_periods:
+            logger.info("Attempting: %s", fname)
+            future = executor.submit(
+                download_upbit_data,
+                ticker="KRW-BTC",
+                interval="minute5",
+                start_date=start,
+                end_date=end,
+                dataset_dir=dataset_dir
+            )
+            futures[future] = (start, end, fname)
         
-        time.sleep(1)
+        for future in as_completed(futures):
+            start, end, fname = futures[future]
+            result = future.result()
+            if result is not None and len(result) > 0:
+                logger.info("✅ Success: %s (%d candles)", fname, len(result))
+            else:
+                logger.warning("❌ Failed or no data available for %s to %s", start, end)
     
-    print("\n\nDone! Check upbit_bot/data/candles/ for available data.")
+    logger.info("Done! Check %s/ for available data.", dataset_dir)
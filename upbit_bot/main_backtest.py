@@ -1,7 +1,7 @@
 import yaml
-import pandas as pd
 import sys
 import os
+from functools import lru_cache
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -10,20 +10,45 @@ from core.advanced_strategy import AdvancedStrategy, AdvancedStrategyConfig
 from core.backtester import Backtester
 
 
+# libyaml 바인딩이 설치돼 있으면 C 로더 사용
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+OHLCV_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+
+
+@lru_cache(maxsize=1)
 def load_settings():
     config_path = os.path.join(os.path.dirname(__file__), "config", "settings.yaml")
     with open(config_path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=YAML_LOADER)
 
 
 if __name__ == "__main__":
     settings = load_settings()
     bt_cfg = settings["backtest"]
 
-    print(f"Running Backtest on {bt_cfg['csv_path']}...")
+    # dataset_path가 있으면 year/month 파티션 Parquet (download_crash_data.py 출력)
+    dataset_path = bt_cfg.get("dataset_path")
+    source = dataset_path or bt_cfg["csv_path"]
+    print(f"Running Backtest on {source}...")
     
     try:
-        df = pd.read_csv(bt_cfg["csv_path"])
+        if dataset_path:
+            import pyarrow.parquet as pq
+            # 필터가 파티션 단위로 push-down → 해당 year/month 파일만 읽음
+            filters = [(k, "=", bt_cfg[k]) for k in ("year", "month") if k in bt_cfg]
+            table = pq.read_table(
+                dataset_path,
+                columns=OHLCV_COLUMNS,
+                filters=filters or None,
+                memory_map=True,
+            )
+        else:
+            import pyarrow.csv as pa_csv
+            # Arrow 멀티스레드 CSV 파서 → 타입 지정된 컬럼으로 바로 생성
+            table = pa_csv.read_csv(bt_cfg["csv_path"])
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
         candles = df.to_dict("records")
 
         adv_cfg = AdvancedStrategyConfig.from_yaml(settings["strategy_advanced"])
@@ -45,5 +70,5 @@ if __name__ == "__main__":
         print(f"Win Rate:        {result['win_rate']*100:.2f}%")
         
     except FileNotFoundError:
-        print(f"Error: CSV file not found at {bt_cfg['csv_path']}")
+        print(f"Error: data not found at {source}")
         print("Please run scripts/upbit_candle_downloader_multi.py first.")
@@ -1,6 +1,7 @@
 import yaml
 import sys
 import os
+from functools import lru_cache
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -10,10 +11,15 @@ from core.trader_multi import UpbitTraderMulti
 from core.telegram_notifier import TelegramNotifier
 
 
+# C 구현 로더 우선, 없으면 SafeLoader
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+@lru_cache(maxsize=1)
 def load_settings():
     config_path = os.path.join(os.path.dirname(__file__), "config", "settings.yaml")
     with open(config_path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=YAML_LOADER)
 
 
 if __name__ == "__main__":
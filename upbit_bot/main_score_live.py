@@ -1,9 +1,15 @@
 import time
 import yaml
+import logging
 import sys
 import os
+import json
+import tempfile
+import numpy as np
 from datetime import datetime, timedelta
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 
 # Core Imports
 from core.system_utils import (
@@ -15,25 +21,62 @@ from core.risk_manager import DailyRiskManager, PositionSizer
 from core.strategy_modules import MarketFilter, SignalEngine, RiskEngine
 from core.strategy_tuner import StrategyTuner
 from core.telegram_notifier import TelegramNotifier
+from core.ws_feed import UpbitWsFeed, interval_seconds, is_current_bar
 
+# libyaml(C) 로더가 있으면 사용 (pure-Python SafeLoader 대비 수 배 빠름)
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# 재시작 시 get_ohlcv 재조회 없이 복원하기 위한 포지션 캐시
+POSITIONS_FILE = os.path.join(os.path.dirname(__file__), 'state', 'positions.json')
+# settings.yaml 파싱 결과 캐시 (API 키 포함 → git 제외 대상인 state/ 아래에 둠)
+CONFIG_CACHE_FILE = os.path.join(os.path.dirname(__file__), 'state', 'settings.cache.json')
+
+@lru_cache(maxsize=1)
 def load_config():
-    """Load configuration from settings.yaml"""
+    """
+    Load configuration from settings.yaml.
+    yaml보다 새로운 JSON 캐시가 있으면 json(C 파서)으로 읽고, 없으면 yaml 파싱 후 캐시 생성
+    """
     config_path = os.path.join(os.path.dirname(__file__), 'config', 'settings.yaml')
+    yaml_mtime = os.path.getmtime(config_path)
+    try:
+        if os.path.getmtime(CONFIG_CACHE_FILE) >= yaml_mtime:
+            with open(CONFIG_CACHE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass # 캐시 없음/손상 → yaml 사용
+
     with open(config_path, 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f)
+        config = yaml.load(f, Loader=YAML_LOADER)
+
+    try:
+        state_dir = os.path.dirname(CONFIG_CACHE_FILE)
+        os.makedirs(state_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=state_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(config, f)
+            os.replace(tmp_path, CONFIG_CACHE_FILE)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+    except (OSError, TypeError, ValueError) as e:
+        LOGGER.warning(f"Config cache write skipped: {e}")
+    return config
 
 # --- HELPER FUNCTIONS ---
-def fee_monitor_triggered(recent_trades_history, max_fee_ratio: float = 0.30):
+def fee_monitor_triggered(total_fees, total_gross, hist_len, max_fee_ratio: float = 0.30):
     """
-    recent_trades_history item: {'fee': x, 'gross_pnl': y, 'timestamp': ...}
+    total_fees / total_gross: 최근 윈도우 fee, gross_pnl 합계 (ring buffer 갱신 시 누적 유지)
+    hist_len: 윈도우 내 트레이드 수
     """
-    if not recent_trades_history:
-        return False, {"reason": "no_history"}
-
-    total_fees = sum(float(t.get("fee", 0.0)) for t in recent_trades_history)
-    total_gross = sum(float(t.get("gross_pnl", 0.0)) for t in recent_trades_history)
+    meta = {"window": hist_len, "max_fee_ratio": max_fee_ratio}
+    if hist_len == 0:
+        meta["reason"] = "no_history"
+        return False, meta
 
-    meta = {"total_fees": total_fees, "total_gross_pnl": total_gross, "window": len(recent_trades_history)}
+    meta["total_fees"] = total_fees
+    meta["total_gross_pnl"] = total_gross
 
     # 운영 안전: 최근 윈도우 총손익이 0 이하이면 성과가 깨졌거나 수수료 부담이 과대 → 차단
     if total_gross <= 0.0:
@@ -45,7 +88,6 @@ def fee_monitor_triggered(recent_trades_history, max_fee_ratio: float = 0.30):
 
     ratio = total_fees / total_gross
     meta["fee_ratio"] = ratio
-    meta["max_fee_ratio"] = max_fee_ratio
 
     if ratio > max_fee_ratio:
         meta["reason"] = "fee_ratio_exceeded"
@@ -54,12 +96,73 @@ def fee_monitor_triggered(recent_trades_history, max_fee_ratio: float = 0.30):
     meta["reason"] = "ok"
     return False, meta
 
+def range_atr(df):
+    """평균 (high - low) 폭. ndarray로 직접 계산 (Series 정렬/할당 생략)"""
+    return float(np.subtract(df['high'].to_numpy(copy=False), df['low'].to_numpy(copy=False)).mean())
+
+def _patch_last_bar(df, price, volume):
+    """캐시된 캔들의 마지막(진행 중) 봉을 현재가/누적 거래량으로 갱신 (close, volume, high/low 확장)"""
+    i = len(df) - 1
+    cols = df.columns
+    df.iat[i, cols.get_loc('close')] = price
+    df.iat[i, cols.get_loc('volume')] = volume
+    hi = cols.get_loc('high')
+    lo = cols.get_loc('low')
+    if price > df.iat[i, hi]:
+        df.iat[i, hi] = price
+    if price < df.iat[i, lo]:
+        df.iat[i, lo] = price
+
+def _save_positions(positions):
+    """positions를 디스크에 저장 (tempfile + rename 으로 원자적 교체)"""
+    try:
+        state_dir = os.path.dirname(POSITIONS_FILE)
+        os.makedirs(state_dir, exist_ok=True)
+        data = {}
+        for ticker, pos in positions.items():
+            item = dict(pos)
+            item.pop('expiry_ts', None) # monotonic 값은 프로세스 한정 → 로드 시 재계산
+            data[ticker] = item
+
+        fd, tmp_path = tempfile.mkstemp(dir=state_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4)
+            os.replace(tmp_path, POSITIONS_FILE)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+    except Exception as e:
+        LOGGER.error(f"Positions Save Error: {e}")
+
+def _load_positions(time_limit):
+    """디스크에 저장된 positions 로드 (없거나 깨졌으면 빈 dict)"""
+    if not os.path.exists(POSITIONS_FILE):
+        return {}
+    try:
+        with open(POSITIONS_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        LOGGER.error(f"Positions Load Error: {e}")
+        return {}
+
+    now_ts = time.time()
+    now_mono = time.monotonic()
+    for pos in data.values():
+        if 'entry_time' in pos: # 이전 포맷 (ISO 문자열)
+            pos['entry_time_ts'] = datetime.fromisoformat(pos.pop('entry_time')).timestamp()
+        if pos.get('entry_time_ts'):
+            elapsed = now_ts - pos['entry_time_ts']
+            pos['expiry_ts'] = now_mono + time_limit * 60 - elapsed
+    return data
+
 def main():
     # 1. System Setup
     install_signal_handlers()
     if not acquire_lock():
         sys.exit(1)
     
+    fetch_pool = None
     try:
         LOGGER.info("🤖 Bot Initialization (Final Architecture)...")
         config = load_config()
@@ -77,6 +180,7 @@ def main():
         
         # Strategy Tuner (Enabled by default as requested)
         tuner = StrategyTuner(config, enabled=True) 
+        last_btc_bar_ts = None # 새 BTC 봉이 생겼을 때만 tuner 호출 (tune()이 실제로 평가한 봉)
 
         daily_risk_mgr = DailyRiskManager(max_loss_pct=config['daily_risk']['max_loss_pct'])
         position_sizer = PositionSizer(
@@ -87,32 +191,89 @@ def main():
         )
 
         markets = config['bot']['markets']
+        # 잔고 목록의 currency('BTC')로 바로 거르기 위한 집합 (f-string/리스트 탐색 생략)
+        markets_currencies = frozenset(m.split('-', 1)[1] for m in markets)
         timeframe = config['bot']['timeframe']
+
+        # Config 값은 루프 밖에서 한 번만 조회 (Tuner는 자체 복사본만 바꾸므로 config 자체는 불변)
+        risk_cfg = config['risk']
+        time_limit = risk_cfg['time_limit']
+        tp_target = risk_cfg['tp_target']
+        sl_min_pct = risk_cfg['sl_min_pct']
+        sl_atr_mult = risk_cfg['sl_atr_mult']
+
+        gate_cfg = config['gate']
+        max_open_positions = gate_cfg.get('max_open_positions', 2)
+        max_trades_per_day = gate_cfg['max_trades_per_day']
+        min_minutes_between_entries = gate_cfg['min_minutes_between_entries']
+
+        fm_cfg = config['safety_pins']['fee_monitor']
+        fm_enabled = fm_cfg['enabled']
+        fm_max_fee_ratio = fm_cfg['max_fee_ratio']
+        fm_cooldown_mins = fm_cfg['cooldown_minutes_on_trigger']
+
+        side_cfg = config['safety_pins']['side_mode']
+        side_enabled = side_cfg['enabled']
+        side_adx_thr = side_cfg['adx_side_threshold']
+        side_risk_mult = side_cfg['side_risk_mult']
+        trend_cfg = config['safety_pins'].get('trend_boost', {})
+        trend_enabled = trend_cfg.get('enabled', False)
+        trend_adx_thr = trend_cfg.get('adx_threshold', float('inf'))
+        boost_size_pct = trend_cfg.get('boost_size_pct', 0.0)
+        boost_tp_target = trend_cfg.get('boost_tp_target', tp_target)
+
+        sizing_cfg = config['position_sizing']
+        base_pct = sizing_cfg['base_pct']
+        max_cap = sizing_cfg['max_cap']
+        max_exp_pct = sizing_cfg.get('max_total_exposure_pct', 0.35)
+
+        # 체결 WebSocket 봉 피드 (연결 전/끊김 시에는 REST로 대체)
+        feed = None
+        if config['bot'].get('ws_feed', False):
+            feed = UpbitWsFeed(wrapper, markets, timeframe, lookback=60)
+            if not feed.start():
+                feed = None
+
+        # REST 캔들 캐시: ticker -> (봉 마감 epoch, df, 거래량 기준점). 봉이 바뀌기 전까지는 /v1/ticker만 일괄 조회
+        # 진행 중 봉 거래량 = 당일 누적 거래량 - 기준점 (기준점 = 캔들 조회 직후 누적 거래량 - 그 봉의 거래량)
+        # 당일 누적은 UTC 0시(= KST 09:00, 모든 분봉의 경계)에 리셋되므로 한 봉 안에서는 단조 증가
+        bar_secs = interval_seconds(timeframe)
+        ohlcv_cache = {}
+
+        # REST OHLCV 조회용 워커 풀 (틱마다 생성/종료하지 않고 재사용)
+        fetch_pool = ThreadPoolExecutor(max_workers=min(8, len(markets)), thread_name_prefix="ohlcv")
         
-        # Memory State
-        positions = {}
+        # Memory State (디스크 캐시 우선)
+        positions = _load_positions(time_limit)
         
         # --- GLOBAL STATE for Gate & Frequency ---
-        last_entry_time = None  # Last buy timestamp
+        last_entry_mono = None  # Last buy time (time.monotonic())
         
         # Fee Monitor State
-        # Stores dict: { 'gross_pnl': 1000, 'fee': 50, 'timestamp': ... }
-        recent_trades_history = deque(maxlen=config['safety_pins']['fee_monitor']['window_trades']) 
-        cooldown_until_ts = 0 # Use timestamp(float) or datetime? User code used float time.time()
+        # 최근 W개 트레이드의 fee / gross_pnl 을 ndarray ring buffer로 보관 (합계는 NumPy reduction)
+        fm_window = fm_cfg['window_trades']
+        fees_buf = np.zeros(fm_window, dtype=np.float64)
+        gross_buf = np.zeros(fm_window, dtype=np.float64)
+        hist_cursor = 0
+        hist_len = 0
+        total_fees_live = 0.0 # fees_buf 합계 (append/evict 시 갱신)
+        total_gross_live = 0.0 # gross_buf 합계
+        cooldown_until_mono = 0.0 # time.monotonic() 기준 (NTP 보정/시계 변경 영향 없음)
 
         
         # Performance Tracking for Tuner
-        # { 'trades_last_24h': 0, 'consecutive_losses': 0, 'wins_10': [], 'win_rate_10': 0.5 }
+        # { 'trades_last_24h': 0, 'consecutive_losses': 0, 'wins_10': deque, 'win_rate_10': 0.5 }
         perf_stats = {
             'trades_last_24h': 0,
             'consecutive_losses': 0,
-            'wins_10': [], # Last 10 trades [1, 0, 1, ...]
+            'wins_10': deque(maxlen=10), # Last 10 trades [1, 0, 1, ...]
             'win_rate_10': 0.5
         }
-        last_reset_24h = datetime.now()
+        wins_sum = 0 # sum(wins_10) 누적값
+        last_reset_24h_mono = time.monotonic()
 
         # 3. Restore State
-        LOGGER.info("Restoring positions from Upbit...")
+        LOGGER.info(f"Restoring positions from Upbit... (cached: {len(positions)})")
         try:
             my_balances = wrapper.get_balances()
             # API 응답 유효성 검사
@@ -120,34 +281,49 @@ def main():
                 LOGGER.warning(f"Balances API 응답 이상: {type(my_balances)}")
                 my_balances = []
             
+            held = set()
             for bal in my_balances:
                 # dict 타입 검사
                 if not isinstance(bal, dict):
                     continue
-                if bal.get('currency') == "KRW": 
+                cur = bal.get('currency')
+                if cur not in markets_currencies:
+                    continue
+                ticker = 'KRW-' + cur
+                try:
+                    amount = float(bal.get('balance', 0))
+                    avg = float(bal.get('avg_buy_price', 0))
+                except (ValueError, TypeError):
+                    continue
+                if amount * avg < 5000: continue
+                held.add(ticker)
+
+                # 캐시에 있으면 SL/TP 재계산(get_ohlcv) 생략
+                if ticker in positions:
+                    LOGGER.info(f"Restored {ticker} from cache: Entry {positions[ticker]['entry_price']}")
                     continue
-                ticker = f"KRW-{bal.get('currency', '')}"
-                if ticker in markets:
-                    try:
-                        amount = float(bal.get('balance', 0))
-                        avg = float(bal.get('avg_buy_price', 0))
-                    except (ValueError, TypeError):
-                        continue
-                    if amount * avg < 5000: continue
                     
-                    df = wrapper.get_ohlcv(ticker, interval=timeframe, count=20)
-                    if df is not None:
-                        risk_cfg = config['risk']
-                        current_atr = (df['high'] - df['low']).mean()
-                        sl_amt = max(avg * risk_cfg['sl_min_pct'], current_atr * risk_cfg['sl_atr_mult'])
+                df = wrapper.get_ohlcv(ticker, interval=timeframe, count=20)
+                if df is not None:
+                    current_atr = range_atr(df)
+                    sl_amt = max(avg * sl_min_pct, current_atr * sl_atr_mult)
                         
-                        positions[ticker] = {
-                            'entry_price': avg,
-                            'sl': avg - sl_amt,
-                            'tp': avg * (1 + risk_cfg['tp_target']),
-                            'entry_time': datetime.now() 
-                        }
-                        LOGGER.info(f"Restored {ticker}: Entry {avg}")
+                    positions[ticker] = {
+                        'entry_price': avg,
+                        'sl': avg - sl_amt,
+                        'tp': avg * (1 + tp_target),
+                        'entry_time_ts': time.time(),
+                        'expiry_ts': time.monotonic() + time_limit * 60
+                    }
+                    LOGGER.info(f"Restored {ticker}: Entry {avg}")
+
+            # 잔고 조회가 정상일 때만, 더 이상 보유하지 않는 캐시 포지션 정리
+            if my_balances:
+                for ticker in list(positions):
+                    if ticker not in held:
+                        LOGGER.info(f"Dropping stale cached position: {ticker}")
+                        del positions[ticker]
+            _save_positions(positions)
         except Exception as e:
             LOGGER.error(f"Restore Failed: {e}")
 
@@ -157,23 +333,48 @@ def main():
         LOGGER.info("✅ Main Loop Started")
 
         # 4. Main Loop
+        tick_idx = 0 # 주기 로그용 루프 카운터 (벽시계 초 대신)
         while RUNNING:
             try:
+                tick_idx += 1
+                # 틱당 한 번만 시계 조회 후 재사용
+                # 간격/쿨다운 비교는 monotonic, wall clock은 저장용 entry_time_ts에만 사용
+                now_ts = time.time()
+                now_mono = time.monotonic()
+
                 # Stats Auto Reset (24h)
-                if (datetime.now() - last_reset_24h).total_seconds() > 86400:
+                if now_mono - last_reset_24h_mono > 86400:
                     perf_stats['trades_last_24h'] = 0
-                    last_reset_24h = datetime.now()
+                    last_reset_24h_mono = now_mono
 
                 # A-0. Fee Monitor Cooldown Check (Simple Log)
-                if time.time() < cooldown_until_ts:
-                    if datetime.now().second < 5:
-                        remaining = int(cooldown_until_ts - time.time())
+                if now_mono < cooldown_until_mono:
+                    if tick_idx % 6 == 0: # 10초 sleep 기준 약 1분마다
+                        remaining = int(cooldown_until_mono - now_mono)
                         LOGGER.warning(f"❄️ Fee Monitor Cooldown Active ({remaining//60}m left)")
                     time.sleep(10)
                     continue
 
-                # A. Risk Management (Daily & Equity)
-                total_equity = wrapper.compute_total_equity()
+                # A. 잔고 일괄 조회 (틱당 1회) → 티커별 잔고는 bal_map에서 로컬 조회
+                bals = wrapper.get_balances()
+                if not bals:
+                    # 조회 실패 시 잔고 0으로 오인해 포지션을 지우지 않도록 이번 틱은 건너뜀
+                    LOGGER.warning("Balances unavailable. Retrying...")
+                    time.sleep(5)
+                    continue
+                krw_bal = 0.0
+                bal_map = {}
+                for b in bals:
+                    if not isinstance(b, dict):
+                        continue
+                    cur = b.get('currency')
+                    if cur == 'KRW':
+                        krw_bal = float(b.get('balance', 0))
+                    elif cur in markets_currencies:
+                        bal_map['KRW-' + cur] = float(b.get('balance', 0))
+
+                # A-1. Risk Management (Daily & Equity)
+                total_equity = wrapper.compute_total_equity(bals)
                 if not daily_risk_mgr.update(total_equity):
                     LOGGER.warning("💤 Daily Risk Limit Hit. Sleeping...")
                     time.sleep(60)
@@ -183,30 +384,81 @@ def main():
                     # Refresh config dynamically if needed or rely on loop
                     pass
 
-                # [VERIFY] Loop Status Log
-                if datetime.now().second < 5: # Log periodically
+                cash = krw_bal
+                exposure = total_equity - cash
+                max_cap_amt = total_equity * max_cap
+                max_exp_amt = total_equity * max_exp_pct - exposure
+
+                # [VERIFY] Loop Status Log (1초 루프 기준 약 1분마다)
+                if tick_idx % 60 == 0:
                     open_cnt = len(positions)
                     exp_pct = (exposure / total_equity) * 100 if total_equity > 0 else 0
                     today_cnt = perf_stats['trades_last_24h']
-                    # LOGGER.info(f"[STATUS] Open: {open_cnt} | Exposure: {exp_pct:.1f}% | TodayTrades: {today_cnt}/3") # Too spammy? Keep it.
-                
-                cash = wrapper.get_balance("KRW")
-                exposure = total_equity - cash
+                    LOGGER.info(f"[STATUS] Open: {open_cnt} | Exposure: {exp_pct:.1f}% | TodayTrades: {today_cnt}/{max_trades_per_day}")
 
                 # B. Market Filter
                 is_market_ok = market_filter.is_market_ok()
                 if not is_market_ok:
                     LOGGER.info("📉 Market Bad (BTC Drop). Buys Paused.")
 
+                # C-0. Data Fetch: WS 피드 우선, 없는 티커만 REST 병렬 조회
+                # (네트워크 대기만 겹치고, 판단/positions 변경은 아래 단일 스레드 루프에서)
+                dfs = {}
+                if feed is not None:
+                    for t in markets:
+                        df = feed.get_df(t)
+                        if df is not None:
+                            dfs[t] = df
+                rest_tickers = [t for t in markets if t not in dfs]
+                if rest_tickers and bar_secs:
+                    cached = [t for t in rest_tickers if t in ohlcv_cache and now_ts < ohlcv_cache[t][0]]
+                    if cached:
+                        quotes = wrapper.get_ticker_quotes(cached)
+                        for t in cached:
+                            quote = quotes.get(t)
+                            if quote is None:
+                                continue # 현재가 조회 실패 → 캔들 재조회
+                            _, df, vol_base = ohlcv_cache[t]
+                            _patch_last_bar(df, quote[0], quote[1] - vol_base)
+                            dfs[t] = df
+                        rest_tickers = [t for t in rest_tickers if t not in dfs]
+                if rest_tickers:
+                    bar_end_ts = (now_ts // bar_secs + 1) * bar_secs if bar_secs else 0.0
+                    futures = {
+                        fetch_pool.submit(wrapper.get_ohlcv, t, interval=timeframe, count=60): t
+                        for t in rest_tickers
+                    }
+                    fetched = {}
+                    for f in as_completed(futures):
+                        t = futures[f]
+                        try:
+                            df = f.result()
+                        except Exception as e:
+                            LOGGER.error(f"OHLCV Fetch Error ({t}): {e}")
+                            continue
+                        dfs[t] = df
+                        # 마지막 행이 마감된 이전 봉이면(봉 직후 무체결, 로컬 시계 오차) 캐시/패치하지 않음
+                        # → 닫힌 봉을 현재가로 덮어쓰지 않고 다음 틱에 재조회
+                        if df is not None and bar_secs and is_current_bar(df, now_ts, bar_secs):
+                            fetched[t] = df
+                    if fetched:
+                        # 거래량 기준점 조회 실패 시 캐시하지 않음 → 다음 틱에 캔들 재조회
+                        quotes = wrapper.get_ticker_quotes(list(fetched))
+                        for t, df in fetched.items():
+                            quote = quotes.get(t)
+                            if quote is not None:
+                                ohlcv_cache[t] = (bar_end_ts, df, quote[1] - float(df['volume'].iat[-1]))
+
                 # C. Strategy Loop
                 for ticker in markets:
                     try:
                         has_position = (ticker in positions)
                         
-                        # Data Fetch
-                        df = wrapper.get_ohlcv(ticker, interval=timeframe, count=60)
+                        df = dfs.get(ticker)
                         if df is None: continue
-                        current_price = df['close'].iloc[-1]
+                        # iloc 인덱서 대신 ndarray 뷰에서 직접 읽기
+                        closes = df['close'].to_numpy(copy=False)
+                        current_price = float(closes[-1])
                         
                         # --- TUNER LOGIC ---
                         # Run tuner using BTC or current ticker data (Representative ticker like BTC is better for regime, but using each ticker helps individuality)
@@ -217,9 +469,17 @@ def main():
                         
                         # Let's fetch BTC data for tuning if not current
                         if ticker == "KRW-BTC":
-                            tuned_cfg = tuner.tune(df, perf_stats)
-                            # Apply to Engine
-                            signal_engine.config = tuned_cfg
+                            bar_ts = df.index[-1]
+                            if bar_ts != last_btc_bar_ts:
+                                prev_tune_ts = tuner.last_tune_ts
+                                tuner.tune(df, perf_stats)
+                                # tune()은 자체 tune_interval(벽시계 300초 = 봉 길이)도 검사해서
+                                # 봉 경계 직후 299.x초면 평가 없이 리턴 → 실제로 평가했을 때만 이 봉을 소비 (다음 틱 재시도)
+                                if tuner.last_tune_ts != prev_tune_ts:
+                                    last_btc_bar_ts = bar_ts
+                                # NOTE: 튜너 결과는 현재 적용되지 않음 (모드 판단/로그만 동작)
+                                # SignalEngine은 __init__에서 cfg/w/ind_cfg/entry_threshold를 복사해 쓰고
+                                # .config 같은 속성은 읽지 않으므로, 적용하려면 그 필드들을 갱신해야 함
 
                         # --- EXIT LOGIC ---
                         if has_position:
@@ -233,6 +493,7 @@ def main():
                                 # Update Highest
                                 if current_price > pos.get('highest_price', 0):
                                     pos['highest_price'] = current_price
+                                    _save_positions(positions)
                                 
                                 # Trailing Exit Condition (e.g. drop 1% from high or ATR based)
                                 # Simple: 1.5% drop from high
@@ -254,18 +515,20 @@ def main():
                                 # If hit TP and NOT TimeCut, do Partial Sell
                                 if is_exit and reason == "TakeProfit":
                                     # Execute Partial Sell (50%)
-                                    bal = wrapper.get_balance(ticker)
+                                    bal = bal_map.get(ticker, 0.0)
                                     if bal > 0:
                                         half_bal = bal * 0.5
                                         # Minimum order check (5000 KRW)
                                         if (half_bal * current_price) > 5000:
                                             order = wrapper.sell_market_safe(ticker, half_bal)
                                             if order:
+                                                bal_map[ticker] = bal - half_bal
                                                 # Update Position State
-                                                positions[ticker]['partial_sold'] = True
-                                                positions[ticker]['sl'] = positions[ticker]['entry_price'] * 1.002 # Break Even + Fee Buffer
-                                                positions[ticker]['highest_price'] = current_price
-                                                msg = f"💰 Partial TP {ticker} (50%)\nSL moved to BE: {positions[ticker]['sl']}"
+                                                pos['partial_sold'] = True
+                                                pos['sl'] = pos['entry_price'] * 1.002 # Break Even + Fee Buffer
+                                                pos['highest_price'] = current_price
+                                                _save_positions(positions)
+                                                msg = f"💰 Partial TP {ticker} (50%)\nSL moved to BE: {pos['sl']}"
                                                 LOGGER.info(msg)
                                                 notifier.send(msg)
                                                 
@@ -278,22 +541,23 @@ def main():
                             # Time Cut (Conditional) - Only for non-partial positions? OR All?
                             # User said "Partial + Trailing" -> usually TimeLimit is relaxed or removed for trailing.
                             # Let's apply TimeLimit only if NOT partial sold (stagnant).
-                            if not is_partial_mode and pos.get('entry_time'):
-                                elapsed = (datetime.now() - pos['entry_time']).total_seconds() / 60
-                                if elapsed > config['risk']['time_limit']:
-                                    pnl_ratio = (current_price - pos['entry_price']) / pos['entry_price']
-                                    if pnl_ratio > 0.001: 
-                                        is_exit = True
-                                        reason = f"TimeCut+Profit ({int(elapsed)}m)"
-                                    else:
-                                        if int(elapsed) % 10 == 0:
-                                            LOGGER.debug(f"TimeCut Wait: {ticker} PnL {pnl_ratio*100:.2f}%")
+                            # 진입 시 계산해 둔 만료 시각(monotonic)과 float 비교만 수행
+                            if not is_partial_mode and pos.get('expiry_ts') and now_mono > pos['expiry_ts']:
+                                elapsed = (now_ts - pos['entry_time_ts']) / 60.0
+                                pnl_ratio = (current_price - pos['entry_price']) / pos['entry_price']
+                                if pnl_ratio > 0.001: 
+                                    is_exit = True
+                                    reason = f"TimeCut+Profit ({int(elapsed)}m)"
+                                else:
+                                    if int(elapsed) % 10 == 0:
+                                        LOGGER.debug(f"TimeCut Wait: {ticker} PnL {pnl_ratio*100:.2f}%")
 
                             if is_exit:
-                                bal = wrapper.get_balance(ticker)
+                                bal = bal_map.get(ticker, 0.0)
                                 if bal > 0:
                                     order = wrapper.sell_market_safe(ticker, bal)
                                     if order:
+                                        bal_map[ticker] = 0.0
                                         pnl = (current_price - pos['entry_price']) / pos['entry_price']
                                         sell_val = bal * current_price
                                         # Approx Fee (Buy + Sell) -> 0.05% * 2 = 0.1%
@@ -305,47 +569,64 @@ def main():
                                         LOGGER.info(msg)
                                         notifier.send(msg)
                                         del positions[ticker]
+                                        _save_positions(positions)
                                         
                                         # Update Stats
                                         perf_stats['trades_last_24h'] += 1
-                                        if pnl > 0:
+                                        win = 1 if pnl > 0 else 0
+                                        if win:
                                             perf_stats['consecutive_losses'] = 0
-                                            perf_stats['wins_10'].append(1)
                                         else:
                                             perf_stats['consecutive_losses'] += 1
-                                            perf_stats['wins_10'].append(0)
-                                        
-                                        if len(perf_stats['wins_10']) > 10:
-                                            perf_stats['wins_10'] = perf_stats['wins_10'][-10:]
-                                        
-                                        perf_stats['win_rate_10'] = sum(perf_stats['wins_10']) / len(perf_stats['wins_10']) if perf_stats['wins_10'] else 0.5
+
+                                        # deque(maxlen=10): 밀려나는 값만 누적합에서 빼기
+                                        wins_10 = perf_stats['wins_10']
+                                        if len(wins_10) == wins_10.maxlen:
+                                            wins_sum -= wins_10[0]
+                                        wins_10.append(win)
+                                        wins_sum += win
+                                        perf_stats['win_rate_10'] = wins_sum / len(wins_10)
 
                                         # --- FEE MONITOR RECORD ---
-                                        if config['safety_pins']['fee_monitor']['enabled']:
-                                            recent_trades_history.append({
-                                                'gross_pnl': pnl_val, # Assuming pnl_val is gross? 
-                                                # pnl_val calculated as: sell_val - (bal * entry) -> This IS Gross PnL (before fees)
-                                                'fee': fee_val,
-                                                'timestamp': datetime.now().isoformat()
-                                            })
+                                        if fm_enabled:
+                                            # pnl_val = sell_val - (bal * entry) -> Gross PnL (before fees)
+                                            # 밀려나는 원소(버퍼가 차기 전엔 0)를 빼고 새 값을 더함
+                                            total_fees_live += fee_val - fees_buf[hist_cursor]
+                                            total_gross_live += pnl_val - gross_buf[hist_cursor]
+                                            fees_buf[hist_cursor] = fee_val
+                                            gross_buf[hist_cursor] = pnl_val
+                                            hist_cursor = (hist_cursor + 1) % fm_window
+                                            hist_len = min(hist_len + 1, fm_window)
+                                            if hist_cursor == 0:
+                                                # 한 바퀴마다 재합산 → 부동소수 누적 오차 제거
+                                                total_fees_live = float(fees_buf.sum())
+                                                total_gross_live = float(gross_buf.sum())
                                             LOGGER.info(f"[TRADE HISTORY] Saved fee={fee_val:.1f} gross={pnl_val:.1f}")
                                         
                                 else:
                                     del positions[ticker]
+                                    _save_positions(positions)
                             continue
 
                         # --- ENTRY LOGIC ---
                         if is_market_ok and not has_position:
                             # 1. Gate Check (Frequency & Max Positions)
-                            gate_cfg = config['gate']
-                            
                             # [NEW] Max Open Positions Check
-                            if len(positions) >= gate_cfg.get('max_open_positions', 2):
+                            if len(positions) >= max_open_positions:
                                 # LOGGER.debug(f"Skipping {ticker}: Max Pos {len(positions)} Reached")
                                 continue
 
-                            if perf_stats['trades_last_24h'] >= gate_cfg['max_trades_per_day']:
+                            if perf_stats['trades_last_24h'] >= max_trades_per_day:
+                                continue
+
+                            # Cooldown / 진입 간격도 O(1) 체크 → 막힐 티커는 analyze(지표 계산) 생략
+                            if now_mono < cooldown_until_mono:
                                 continue
+
+                            if last_entry_mono is not None:
+                                mins_since = (now_mono - last_entry_mono) / 60.0
+                                if mins_since < min_minutes_between_entries:
+                                    continue
                             
                             # 2. Analyze Strategy
                             is_buy, sl, tp, info = signal_engine.analyze(df, btc_ok=True)
@@ -358,7 +639,6 @@ def main():
                                 buy_amount = position_sizer.get_size(total_equity, cash, exposure)
                                 
                                 # [NEW] Total Exposure Cap Check
-                                max_exp_pct = config['position_sizing'].get('max_total_exposure_pct', 0.35)
                                 current_exp_pct = (exposure / total_equity) if total_equity > 0 else 0
                                 projected_exp_pct = ((exposure + buy_amount) / total_equity)
                                 
@@ -366,76 +646,48 @@ def main():
                                     LOGGER.warning(f"🚫 Exposure Limit Block: {ticker} (Proj {projected_exp_pct*100:.1f}% > Max {max_exp_pct*100}%)")
                                     continue
 
-                                # [VERIFICATION LOG] Position Size & Max Cap
-                                limit_pct = config['position_sizing']['max_cap']
-                                base_pct = config['position_sizing']['base_pct']
-                                LOGGER.info(f"[VERIFY] Sizer Output: {buy_amount:,.0f} KRW (Equity {total_equity:,.0f} * Base {base_pct}) / MaxCap {limit_pct*100}%")
-
-                                # 4. Cooldown Check (Global)
-                                now_ts = time.time()
-                                if now_ts < cooldown_until_ts:
-                                    # Already checked at loop start, but double check
-                                    continue
-                                    
-                                if last_entry_time is not None:
-                                    mins_since = (datetime.now() - last_entry_time).total_seconds() / 60
-                                    if mins_since < gate_cfg['min_minutes_between_entries']:
-                                        continue
-
                                 # 5. Fee Monitor Check (Trigger)
-                                if config['safety_pins']['fee_monitor']['enabled']:
+                                # 신호가 난 진입에 대해서만 평가 (트리거 시점부터 쿨다운 시작)
+                                fee_ratio = 0.0
+                                if fm_enabled:
                                     triggered, fm_meta = fee_monitor_triggered(
-                                        recent_trades_history, 
-                                        max_fee_ratio=config['safety_pins']['fee_monitor']['max_fee_ratio']
+                                        total_fees_live, total_gross_live, hist_len,
+                                        max_fee_ratio=fm_max_fee_ratio
                                     )
-                                    LOGGER.info(f"[VERIFY] FeeMonitor: Ratio {fm_meta.get('fee_ratio',0):.4f} (Max {fm_meta['max_fee_ratio']}) / history {fm_meta['window']}")
+                                    fee_ratio = fm_meta.get('fee_ratio', 0.0)
                                     
                                     if triggered:
-                                        cooldown_mins = config['safety_pins']['fee_monitor']['cooldown_minutes_on_trigger']
-                                        cooldown_until_ts = now_ts + (cooldown_mins * 60)
-                                        LOGGER.warning(f"[FEE MONITOR BLOCK] {ticker} meta={fm_meta} -> cooldown {cooldown_mins}m")
+                                        cooldown_until_mono = now_mono + (fm_cooldown_mins * 60)
+                                        LOGGER.warning(f"[FEE MONITOR BLOCK] {ticker} meta={fm_meta} -> cooldown {fm_cooldown_mins}m")
                                         continue
 
-                                # 6. Side Mode (ADX)
-                                side_cfg = config['safety_pins']['side_mode']
-                                if side_cfg['enabled']:
-                                    # Handle ADX None/NaN
-                                    if adx_val is not None and float(adx_val) < side_cfg['adx_side_threshold']:
-                                        original_amount = buy_amount
-                                        buy_amount = buy_amount * side_cfg['side_risk_mult']
-                                        LOGGER.info(f"[VERIFY] 🛡️ Side Mode Active (ADX {float(adx_val):.2f} < {side_cfg['adx_side_threshold']})")
-                                        LOGGER.info(f"[VERIFY] Size Reduced: {original_amount:,.0f} -> {buy_amount:,.0f} (*{side_cfg['side_risk_mult']})")
+                                # 6. Sizing: Side Mode 축소 / Trend Boost 확대 / 상한을 한 번에 적용
+                                adx_f = float(adx_val) if adx_val is not None else None
+                                is_side = side_enabled and adx_f is not None and adx_f < side_adx_thr
+                                is_boosted = trend_enabled and bool(adx_f) and adx_f >= trend_adx_thr
+                                side_mult = side_risk_mult if is_side else 1.0
+                                boost_amt = min(total_equity * boost_size_pct, max_cap_amt) if is_boosted else 0.0
+                                final_tp_target = boost_tp_target if is_boosted else tp_target
+                                sized_amount = max(buy_amount * side_mult, boost_amt)
+                                sized_amount = min(sized_amount, max_exp_amt)
+
+                                # [VERIFY] Sizer / FeeMonitor / Side / Boost 를 한 줄로 (INFO 꺼져 있으면 포맷 생략)
+                                if LOGGER.isEnabledFor(logging.INFO):
+                                    LOGGER.info(
+                                        "[VERIFY] %s Sizer %.0f KRW (Equity %.0f * Base %s, MaxCap %.1f%%) | "
+                                        "FeeRatio %.4f (Max %s, history %d) | ADX %s | Side %s (*%s) | Boost %s -> Size %.0f, TP %.2f%%",
+                                        ticker, buy_amount, total_equity, base_pct, max_cap * 100,
+                                        fee_ratio, fm_max_fee_ratio, hist_len, adx_f, is_side, side_mult, is_boosted,
+                                        sized_amount, final_tp_target * 100
+                                    )
+                                buy_amount = sized_amount
 
                                 # 7. Min Value Check
                                 if buy_amount < 5000:
                                     LOGGER.warning(f"Skipping {ticker}: Size {buy_amount:.0f} < Min")
                                     continue
-                                
-                                # 9. Order Execution
-                                # [NEW] Trend Boost Logic
-                                trend_cfg = config['safety_pins'].get('trend_boost', {})
-                                final_tp_target = config['risk']['tp_target']
-                                
-                                is_boosted = False
-                                if trend_cfg.get('enabled', False):
-                                    # Info 'adx' passed from Analyze
-                                    adx_val = info.get('adx', 0)
-                                    if adx_val and float(adx_val) >= trend_cfg['adx_threshold']:
-                                        # Boost Size
-                                        boost_size = total_equity * trend_cfg['boost_size_pct']
-                                        # Max Cap Check
-                                        max_cap_amt = total_equity * config['position_sizing']['max_cap']
-                                        boost_size = min(boost_size, max_cap_amt)
-                                        
-                                        # If boost is greater than current (and greater than min), apply
-                                        if boost_size > buy_amount:
-                                            buy_amount = boost_size
-                                            is_boosted = True
-                                        
-                                        # Boost TP
-                                        final_tp_target = trend_cfg['boost_tp_target']
-                                        LOGGER.info(f"🚀 Trend Boost Activated! (ADX {float(adx_val):.1f}) -> Size {buy_amount:,.0f}, TP {final_tp_target*100}%")
 
+                                # 9. Order Execution
                                 order = wrapper.buy_market(ticker, buy_amount)
                                 if order:
                                     entry_price = float(order['price']) # or executed price
@@ -443,9 +695,7 @@ def main():
                                     if entry_price == 0: entry_price = current_price
                                     
                                     # SL / TP
-                                    sl_min_pct = config['risk']['sl_min_pct']
-                                    sl_atr_mult = config['risk']['sl_atr_mult']
-                                    atr = info.get('atr', 0) # Assuming ATR is available in info
+                                    atr = info.get('atr', 0) # analyze()가 매수 신호마다 항상 채워줌
                                     sl_amt = max(entry_price * sl_min_pct, atr * sl_atr_mult)
                                     
                                     # Calculate TP based on (Boosted or Normal) target
@@ -456,13 +706,17 @@ def main():
                                         'entry_price': entry_price,
                                         'sl': sl_price,
                                         'tp': tp_price,
-                                        'entry_time': datetime.now(),
+                                        'entry_time_ts': now_ts,
+                                        'expiry_ts': now_mono + time_limit * 60,
                                         'partial_sold': False,
                                         'highest_price': entry_price
                                     }
-                                    last_entry_time = datetime.now() # Update Gate
+                                    _save_positions(positions)
+                                    bal_map[ticker] = bal_map.get(ticker, 0.0) + float(order.get('executed_volume') or 0)
+                                    last_entry_mono = now_mono # Update Gate
                                     
-                                    msg = f"🚀 BUY {ticker}\nPrice: {entry_price}\nScore: {score}\nSize: {buy_amount:.0f}\nADX: {adx_val:.1f if adx_val else 'N/A'}"
+                                    adx_txt = f"{adx_f:.1f}" if adx_f is not None else 'N/A'
+                                    msg = f"🚀 BUY {ticker}\nPrice: {entry_price}\nScore: {score}\nSize: {buy_amount:.0f}\nADX: {adx_txt}"
                                     LOGGER.info(msg)
                                     notifier.send(msg)
                                     
@@ -476,6 +730,8 @@ def main():
                 time.sleep(5)
                 
     finally:
+        if fetch_pool is not None:
+            fetch_pool.shutdown(wait=False, cancel_futures=True)
         LOGGER.info("👋 Bot Shutdown. Releasing Lock.")
         release_lock()
 
@@ -1,95 +1,350 @@
 import argparse
-import csv
-import time
+import asyncio
+import gzip
+import json
+import math
+import operator
 import os
+import shutil
+import time
 from datetime import datetime, timedelta
-import requests
+import httpx
+
+try:
+    # orjson: bytes를 바로 파싱 (UTF-8 decode 단계 생략, stdlib json 대비 수 배 빠름)
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    # h2 설치 시 HTTP/2: 커넥션 하나에 동시 요청을 멀티플렉싱 (HTTP/1.1은 커넥션당 요청 1개)
+    import h2 # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+try:
+    # ijson: --stream-json 옵션용 증분 파서 (응답 전체를 메모리에 올리지 않음)
+    import ijson
+except ImportError:
+    ijson = None
 
 # Simple standalone downloader to avoid complex imports in scripts
 BASE_URL = "https://api.upbit.com/v1"
+CONCURRENCY = 5 # 동시에 진행 중인 요청 수 (마켓 간 공유)
+RATE_LIMIT = 8 # 초당 요청 수 (Upbit 시세 API 10회/초 한도 아래로)
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.3 # 0.3, 0.6, 1.2, ... 초
+RETRY_STATUS = {429, 500, 502, 503, 504}
+WRITE_BUFFER = 1 << 20 # 1 MiB 쓰기 버퍼 → write() syscall 수 감소
+PAGE_SIZE = 200 # 캔들 API 최대 count
+PAGE_BATCH = 20 # 한 번에 gather 하는 페이지 수 (메모리 상한)
+ROW_GROUP_ROWS = 64 * 1024 # parquet row group 크기
+PROGRESS_INTERVAL = 1.0 # 진행 상황 출력 최소 간격(초)
+CSV_HEADER = "timestamp,date_kst,open,high,low,close,volume\r\n"
+# 한 행 = 포맷 연산 한 번. 값은 정수/숫자/고정 형식 날짜뿐이라 csv 인용 처리가 필요 없음
+# (float은 %s = repr → csv.writer 출력과 동일, 가격/거래량 자릿수 손실 없음)
+CSV_ROW_FMT = "%d,%s,%s,%s,%s,%s,%s\r\n"
+# 캔들 dict → 행 튜플을 C 레벨 itemgetter 한 번으로 (필드별 c["..."] 7회 대신)
+candle_row = operator.itemgetter(
+    "timestamp", "candle_date_time_kst", "opening_price", "high_price",
+    "low_price", "trade_price", "candle_acc_trade_volume",
+)
+
+def open_csv(path, compress=False, append=False):
+    """CSV 출력 파일 열기. compress면 gzip(level 1, 속도 우선)으로 쓰면서 압축"""
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=1)
+    return open(path, "a" if append else "w", newline="", encoding="utf-8", buffering=WRITE_BUFFER)
+
+def resume_point(path):
+    """
+    이전 실행이 남긴 CSV의 마지막 행 date_kst (없거나 데이터 행이 없으면 None).
+    쓰기 도중 중단돼 끝에 잘린 행이 있으면 마지막 완전한 행까지 잘라냄
+    """
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        return None
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        tail_start = f.seek(max(0, size - 4096)) # 파일 끝 일부만 읽음 (전체 스캔 X)
+        tail = f.read()
+        end = tail.rfind(b"\n") + 1
+        if end == 0:
+            return None
+        if tail_start + end < size:
+            f.truncate(tail_start + end)
+        last = tail[:end].splitlines()[-1]
+        if last.startswith(b"timestamp,"): # 헤더만 있음
+            return None
+        return last.split(b",", 2)[1].decode()
+
+class CsvSink:
+    """행 튜플(timestamp, date_kst, open, high, low, close, volume)을 CSV로 기록"""
+    def __init__(self, path, compress=False, append=False):
+        self.f = open_csv(path, compress, append)
+        if not append:
+            self.f.write(CSV_HEADER)
+        self.checked = False
+
+    def write_rows(self, rows):
+        if rows and not self.checked:
+            # 인용 처리 없이 쓰므로 첫 행에서 한 번만 확인 (숫자 필드는 repr이라 항상 안전)
+            date_kst = rows[0][1]
+            if any(ch in date_kst for ch in ',"\r\n'):
+                raise ValueError(f"date_kst not safe for unquoted CSV: {date_kst!r}")
+            self.checked = True
+        self.f.write("".join([CSV_ROW_FMT % row for row in rows])) # 페이지 단위 한 번에 기록
+
+    def close(self):
+        self.f.close()
+
+class ParquetSink:
+    """같은 행 튜플을 모아 ROW_GROUP_ROWS 단위 row group으로 parquet(zstd) 기록"""
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.schema = pa.schema([
+            ("timestamp", pa.int64()),
+            ("date_kst", pa.string()),
+            ("open", pa.float64()),
+            ("high", pa.float64()),
+            ("low", pa.float64()),
+            ("close", pa.float64()),
+            ("volume", pa.float64()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        self.buf = []
+
+    def write_rows(self, rows):
+        self.buf.extend(rows)
+        if len(self.buf) >= ROW_GROUP_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if not self.buf:
+            return
+        columns = zip(*self.buf)
+        arrays = [self.pa.array(col, type=field.type) for col, field in zip(columns, self.schema)]
+        self.writer.write_batch(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.buf = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+def open_sink(path, fmt="csv", compress=False, append=False):
+    if fmt == "parquet":
+        return ParquetSink(path)
+    return CsvSink(path, compress, append)
+
+class AsyncRateLimiter:
+    """토큰 버킷 (초당 rate개, 최대 burst개 연속). 고정 sleep 대신 한도까지 요청을 채움"""
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_LIMIT):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last_ts = time.monotonic()
+        self._lock = asyncio.Lock() # 마켓 코루틴들이 같은 버킷을 공유
+
+    async def wait(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last_ts) * self.rate)
+                self.last_ts = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
 
-def get_candles(market, unit, to_datetime=None, count=200):
+class ResponseReader:
+    """httpx 응답 바이트 스트림을 ijson.items_async가 읽는 async read() 형태로 감쌈"""
+    def __init__(self, response):
+        self._chunks = response.aiter_bytes()
+
+    async def read(self, size=-1):
+        if size == 0: # ijson이 타입 확인용으로 read(0) 호출
+            return b""
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return b""
+
+def retry_after_seconds(response):
+    """429 응답의 Retry-After(초) 헤더. 없거나 형식이 다르면 None"""
+    try:
+        return max(0.0, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return None
+
+async def get_candles(session, semaphore, limiter, market, unit, to_datetime=None, count=200, stream_json=False):
+    """캔들 한 페이지. 상장 이전 구간이면 [], 재시도 불가 오류/재시도 소진이면 None"""
     url = f"{BASE_URL}/candles/minutes/{unit}"
     params = {"market": market, "count": count}
     if to_datetime:
         params["to"] = to_datetime
-    
-    headers = {"accept": "application/json"}
-    response = requests.get(url, params=params, headers=headers)
-    
-    if response.status_code != 200:
-        print(f"Error: {response.status_code}, {response.text}")
-        return []
-    
-    return response.json()
 
-def download_candles(market, unit, start_date, end_date, outdir):
+    for attempt in range(MAX_RETRIES):
+        retry_after = None
+        try:
+            async with semaphore:
+                await limiter.wait()
+                async with session.stream("GET", url, params=params) as response:
+                    if response.status_code == 200:
+                        if stream_json:
+                            # 바이트 버퍼 + 객체 리스트를 동시에 들지 않고, 도착하는 대로 캔들 단위로 파싱
+                            return [c async for c in ijson.items_async(ResponseReader(response), "item", use_float=True)]
+                        return json_loads(await response.aread())
+                    if response.status_code not in RETRY_STATUS:
+                        await response.aread()
+                        print(f"Error: {response.status_code}, {response.text}")
+                        return None
+                    reason = f"HTTP {response.status_code}"
+                    if response.status_code == 429:
+                        retry_after = retry_after_seconds(response)
+        except httpx.TransportError as e:
+            reason = repr(e)
+        # 429/5xx/연결 오류 → 세마포어를 놓고 (Retry-After 또는) 지수 백오프 후 재시도
+        wait = retry_after if retry_after is not None else BACKOFF_FACTOR * (2 ** attempt)
+        print(f"{reason} ({market}), retry in {wait:.1f}s")
+        await asyncio.sleep(wait)
+
+    print(f"Error: giving up on {market} after {MAX_RETRIES} retries")
+    return None
+
+async def download_candles(session, semaphore, limiter, market, unit, start_date, end_date, outdir,
+                           fmt="csv", compress=False, stream_json=False):
     os.makedirs(outdir, exist_ok=True)
-    filename = f"{market.replace('KRW-', '').lower()}-{unit}m-{start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')}.csv"
+    filename = f"{market.replace('KRW-', '').lower()}-{unit}m-{start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')}"
+    if fmt == "parquet":
+        filename += ".parquet"
+    else:
+        filename += ".csv.gz" if compress else ".csv"
     filepath = os.path.join(outdir, filename)
+    tmp_path = filepath + ".tmp"
+    step = timedelta(minutes=unit)
+
+    # 재실행 시 이어받기 (plain CSV만): 마지막 봉 다음부터만 요청
+    # - 최종 파일은 모든 페이지가 성공한 실행만 만들 수 있음 → 구멍 없이 마지막 행까지 연속
+    # - 실패/중단된 실행은 .tmp만 남기고, .tmp도 실패 페이지 직전까지만 기록돼 있어 그 뒤부터 이어받으면 됨
+    # 기존 최종 파일은 그대로 두고 .tmp로 복사해 이어 씀 → 성공했을 때만 교체
+    # (업데이트가 실패해도 기존 완료 파일은 원래 경로에 남음)
+    resume_kst = None
+    if fmt == "csv" and not compress:
+        if os.path.exists(filepath) and not os.path.exists(tmp_path):
+            shutil.copyfile(filepath, tmp_path)
+        resume_kst = resume_point(tmp_path)
+    if resume_kst:
+        start_date = max(start_date, datetime.fromisoformat(resume_kst) + step)
+        if start_date > end_date:
+            os.replace(tmp_path, filepath)
+            print(f"{market}: already up to date (last {resume_kst}) -> {filepath}")
+            return
+        print(f"Resuming {market} after {resume_kst}")
     
     print(f"Downloading {market} ({unit}m) from {start_date} to {end_date} -> {filepath}")
     
-    all_candles = []
-    current_to = end_date
-    
-    while True:
-        to_str = current_to.strftime("%Y-%m-%d %H:%M:%S")
-        candles = get_candles(market, unit, to_str, count=200)
-        
-        if not candles:
-            break
-            
-        # Filter candles before start_date
-        valid_candles = []
-        for c in candles:
-            # candle_date_time_kst: "2024-01-01T09:00:00"
-            c_dt = datetime.strptime(c["candle_date_time_kst"], "%Y-%m-%dT%H:%M:%S")
-            if c_dt >= start_date and c_dt <= end_date:
-                valid_candles.append({
-                    "timestamp": c["timestamp"],
-                    "date_kst": c["candle_date_time_kst"],
-                    "open": c["opening_price"],
-                    "high": c["high_price"],
-                    "low": c["low_price"],
-                    "close": c["trade_price"],
-                    "volume": c["candle_acc_trade_volume"]
-                })
-        
-        all_candles.extend(valid_candles)
-        
-        # Check last candle time
-        last_candle_dt = datetime.strptime(candles[-1]["candle_date_time_kst"], "%Y-%m-%dT%H:%M:%S")
-        if last_candle_dt < start_date:
-            break
-            
-        current_to = last_candle_dt
-        time.sleep(0.1) # Rate limit
-        print(f"Collected {len(all_candles)} candles... (Last: {last_candle_dt})")
+    # 페이지 경계(to)를 미리 계산해 여러 페이지를 동시에 요청하고, 과거 페이지부터 순서대로 기록
+    # - to는 배타적 상한 → 종료 시각 봉까지 포함하도록 한 봉 뒤에서 시작
+    # - "+09:00"을 붙여 KST로 지정 (오프셋 없는 to는 UTC로 해석됨)
+    # - 거래 없는 봉은 API가 건너뛰므로 페이지가 더 과거로 확장될 뿐 빈 구간은 생기지 않음 (겹침은 dedup)
+    first_to = end_date + step
+    pages = max(1, math.ceil((first_to - start_date) / (step * PAGE_SIZE)))
+    tos = [
+        (first_to - step * PAGE_SIZE * k).isoformat(timespec="seconds") + "+09:00"
+        for k in reversed(range(pages))
+    ]
 
-    # Sort by date ascending
-    all_candles.sort(key=lambda x: x["date_kst"])
+    # candle_date_time_kst("2024-01-01T09:00:00")는 고정 폭 ISO 문자열 → 문자열 비교 = 시각 비교
+    # (timestamp 필드는 봉 시작이 아니라 마지막 체결 시각이라 경계 비교에 쓰지 않음)
+    start_kst = start_date.isoformat(timespec="seconds")
+    end_kst = end_date.isoformat(timespec="seconds")
+    # 행은 과거→최신 순으로만 기록되므로 마지막으로 쓴 봉 시각(high-water mark)만 기억하면
+    # 페이지 경계의 겹친 캔들을 걸러낼 수 있음 (timestamp set 불필요, 메모리 O(1))
+    last_kst = resume_kst or ""
+    collected = 0
+    failed_to = None
+    last_progress = time.monotonic()
     
-    # Remove duplicates
-    unique_candles = []
-    seen_timestamps = set()
-    for c in all_candles:
-        if c["timestamp"] not in seen_timestamps:
-            unique_candles.append(c)
-            seen_timestamps.add(c["timestamp"])
+    sink = open_sink(tmp_path, fmt, compress, append=resume_kst is not None)
+    try:
+        for i in range(0, pages, PAGE_BATCH):
+            batch = tos[i:i + PAGE_BATCH]
+            results = await asyncio.gather(*(
+                get_candles(session, semaphore, limiter, market, unit, to, count=PAGE_SIZE, stream_json=stream_json)
+                for to in batch
+            ))
+            rows = []
+            for to, candles in zip(batch, results):
+                if candles is None:
+                    # 실패한 페이지를 건너뛰면 파일 중간에 구멍이 생김 → 그 앞까지만 기록하고 중단
+                    failed_to = to
+                    break
+                if not candles:
+                    continue
+                # 페이지 양 끝(최신/최과거)이 모두 범위 안이면 행마다 경계 비교 생략
+                in_range = (
+                    start_kst <= candles[-1]["candle_date_time_kst"]
+                    and candles[0]["candle_date_time_kst"] <= end_kst
+                )
+                # 페이지 내부는 최신순 → 뒤집어서 과거순으로 기록
+                for row in map(candle_row, reversed(candles)):
+                    date_kst = row[1]
+                    if in_range or start_kst <= date_kst <= end_kst:
+                        if date_kst <= last_kst: # 페이지 경계에서 겹친 캔들
+                            continue
+                        last_kst = date_kst
+                        rows.append(row)
+            # 파일 쓰기/압축은 블로킹 → 스레드에서 처리해 다른 마켓의 응답 처리를 막지 않음
+            await asyncio.to_thread(sink.write_rows, rows)
+            collected += len(rows)
+            if failed_to:
+                break
+            # 리다이렉트/SSH 출력은 print마다 동기 write → 초당 한 번만
+            now = time.monotonic()
+            if now - last_progress >= PROGRESS_INTERVAL:
+                last_progress = now
+                print(f"Collected {collected} candles... (page {i + len(batch)}/{pages}, to {batch[-1]})")
+    finally:
+        await asyncio.to_thread(sink.close)
+
+    if failed_to:
+        # 최종 파일로 교체하지 않음: 완료되지 않은 결과는 .tmp로만 남김
+        print(f"Error: {market} stopped at page to={failed_to}, {collected} candles kept in {tmp_path}")
+        if fmt == "csv" and not compress:
+            print(f"Re-run the same command to resume {market} from there.")
+        return
+
+    if collected or resume_kst:
+        os.replace(tmp_path, filepath)
+    else:
+        os.remove(tmp_path)
             
-    print(f"Total unique candles: {len(unique_candles)}")
+    print(f"Total unique candles: {collected}")
     
-    if unique_candles:
-        keys = unique_candles[0].keys()
-        with open(filepath, "w", newline="", encoding="utf-8") as f:
-            dict_writer = csv.DictWriter(f, keys)
-            dict_writer.writeheader()
-            dict_writer.writerows(unique_candles)
+    if collected:
         print("Done.")
     else:
         print("No candles found.")
 
+async def main(markets, unit, start_dt, end_dt, outdir, fmt="csv", compress=False, stream_json=False):
+    # 마켓 간, 그리고 마켓 내 페이지 간 모두 동시 진행 (실제 요청 속도는 limiter/semaphore가 제어)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    limiter = AsyncRateLimiter()
+    # keep-alive 커넥션 풀: 페이지마다 TCP/TLS 핸드셰이크를 다시 하지 않음
+    limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY, keepalive_expiry=30)
+    timeout = httpx.Timeout(10, connect=3.05)
+    async with httpx.AsyncClient(
+        http2=HTTP2, limits=limits, timeout=timeout, headers={"accept": "application/json"}
+    ) as session:
+        await asyncio.gather(*(
+            download_candles(session, semaphore, limiter, m, unit, start_dt, end_dt, outdir, fmt, compress, stream_json)
+            for m in markets
+        ))
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Upbit Candle Downloader (Multi)")
     parser.add_argument("--markets", type=str, required=True, help="Comma separated markets (e.g. KRW-BTC,KRW-ETH)")
@@ -97,12 +352,16 @@ if __name__ == "__main__":
     parser.add_argument("--from_date", type=str, required=True, help="Start date (YYYY-MM-DD)")
     parser.add_argument("--to_date", type=str, required=True, help="End date (YYYY-MM-DD HH:MM:SS)")
     parser.add_argument("--outdir", type=str, default="data/candles", help="Output directory")
+    parser.add_argument("--format", type=str, default="csv", choices=["csv", "parquet"], help="Output format")
+    parser.add_argument("--compress", action="store_true", help="Write gzip-compressed CSV (.csv.gz); parquet is always zstd")
+    parser.add_argument("--stream-json", action="store_true", help="Parse page responses incrementally with ijson (lower peak memory)")
     
     args = parser.parse_args()
+    if args.stream_json and ijson is None:
+        parser.error("--stream-json requires ijson (pip install ijson)")
     
-    markets = args.markets.split(",")
+    markets = [m.strip() for m in args.markets.split(",")]
     start_dt = datetime.strptime(args.from_date, "%Y-%m-%d")
     end_dt = datetime.strptime(args.to_date, "%Y-%m-%d %H:%M:%S")
     
-    for m in markets:
-        download_candles(m.strip(), args.unit, start_dt, end_dt, args.outdir)
+    asyncio.run(main(markets, args.unit, start_dt, end_dt, args.outdir, args.format, args.compress, args.stream_json))
@@ -0,0 +1,53 @@
+"""
+REST 캔들 캐시 판정 테스트 (ws_feed.bar_start_kst / is_current_bar)
+
+Usage:
+    cd upbit_bot && python -m pytest -q test_bar_cache.py
+    (또는 python test_bar_cache.py)
+"""
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from core.ws_feed import bar_start_kst, is_current_bar
+
+BAR_SECS = 300 # minute5
+# 2024-01-08 12:03:20 KST (= 03:03:20 UTC) → 진행 중 봉은 12:00 KST
+NOW_TS = datetime(2024, 1, 8, 3, 3, 20, tzinfo=timezone.utc).timestamp()
+
+
+def make_df(last_start, bars=3):
+    """pyupbit get_ohlcv 형태 (KST naive 봉 시작 인덱스)"""
+    index = pd.date_range(end=last_start, periods=bars, freq=f"{BAR_SECS}s")
+    return pd.DataFrame({
+        'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1.0, 'value': 1.0,
+    }, index=index)
+
+
+def test_bar_start_kst():
+    assert bar_start_kst(NOW_TS, BAR_SECS) == pd.Timestamp("2024-01-08 12:00:00")
+    # 경계 시각은 새 봉의 시작
+    boundary = datetime(2024, 1, 8, 3, 5, tzinfo=timezone.utc).timestamp()
+    assert bar_start_kst(boundary, BAR_SECS) == pd.Timestamp("2024-01-08 12:05:00")
+
+
+def test_current_bar_is_cached():
+    assert is_current_bar(make_df("2024-01-08 12:00:00"), NOW_TS, BAR_SECS)
+
+
+def test_last_candle_before_current_bar_is_not_cached():
+    # 새 봉에 아직 체결이 없으면 Upbit는 그 봉을 빼고 돌려줌 → 마지막 행은 마감된 11:55 봉
+    assert not is_current_bar(make_df("2024-01-08 11:55:00"), NOW_TS, BAR_SECS)
+    # 무체결 봉이 여러 개 이어진 경우도 동일
+    assert not is_current_bar(make_df("2024-01-08 11:40:00"), NOW_TS, BAR_SECS)
+
+
+def test_empty_frame_is_not_cached():
+    assert not is_current_bar(make_df("2024-01-08 12:00:00").iloc[:0], NOW_TS, BAR_SECS)
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")